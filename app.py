@@ -1,281 +1,272 @@
 import streamlit as st
-from lumii_core_logic_v2 import LumiiState, generate_response_with_memory_safety
-import base64
 import os
-
-from datetime import datetime
+import sys
+import textwrap
+import time
+from collections import deque
+from itertools import islice, takewhile
+from pathlib import Path
+
+from datetime import datetime, time as dtime, timedelta
 from zoneinfo import ZoneInfo  # built-in in Python 3.9+
 
+from lumii_ui import (
+    CSS, DISCLAIMER_MD, HEADER_PREFIX, HEADER_SUFFIX, HERO_PREFIX, HERO_SUFFIX,
+    HIGHLIGHTS_HTML, STATUS_BANNERS, SUBJECTS_HTML, WELCOME_HTML,
+    markdown_to_html, message_html, needs_st_markdown,
+)
+
+# ───────────────────────── Page setup ─────────────────────────
+# Must be the first Streamlit call of every run.
+st.set_page_config(page_title="My Friend Lumii", page_icon="🎓", layout="centered")
+
 DAILY_LIMIT = 20
 TZ = ZoneInfo("Europe/Ljubljana")
 FEEDBACK_FORM_URL = "https://forms.gle/XudYBTGsweCaKhc96"  # ← replace with your Google Form
 
 
+def _today() -> str:
+    """Today's ISO date in TZ; recomputed only once local midnight has passed."""
+    cached = st.session_state.get("_today")
+    if cached is None or time.time() >= cached[1]:
+        now = datetime.now(TZ)
+        midnight = datetime.combine(now.date() + timedelta(days=1), dtime.min, TZ)
+        cached = st.session_state["_today"] = (now.date().isoformat(), midnight.timestamp())
+    return cached[0]
+
 # Require users to re-accept if we change the disclaimer meaningfully
 DISCLAIMER_VERSION = "2025-09-01-v1"
 
-@st.cache_data
-def _logo_b64(path="logo.png") -> str:
-    try:
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
-    except Exception:
-        return ""  # falls back to no image if file missing
+# Static-serving URL for the logo (browser-cached), or "" if the file is missing.
+# A stat per run is cheaper than a cache lookup keyed on the function source.
+_LOGO_PATH = Path("static/logo.png")
+_LOGO_URL = "./app/" + _LOGO_PATH.as_posix() if _LOGO_PATH.is_file() else ""
+
+def _logo_img(width: int, shadow: str) -> str:
+    """<img> tag for the logo, or "" when the file is missing."""
+    if not _LOGO_URL:
+        return ""
+    return (
+        "<img src='" + _LOGO_URL + "' alt='Lumii Logo' "
+        f"style='width:{width}px; border-radius:16px; filter:drop-shadow({shadow});'>"
+    )
 
-# ───────────────────────── Page setup ─────────────────────────
-st.set_page_config(page_title="My Friend Lumii", page_icon="🎓", layout="centered")
+def render_status_badge(has_api_key: bool, memory_safe_mode: bool = False) -> str:
+    if not has_api_key:
+        return "critical"
+    return "warning" if memory_safe_mode else "normal"
+
+def _bubble(m: dict) -> tuple:
+    """(id, HTML bubble, message); HTML is None when the body needs st.markdown."""
+    return m["id"], None if needs_st_markdown(m["content"]) else message_html(m), m
+
+def _transcript_parts(bubbles) -> list:
+    """Runs of HTML bubbles joined into one string each; st.markdown bodies as dicts."""
+    parts: list = []
+    run: list = []
+    for _, html, m in bubbles:
+        if html is None:
+            if run:
+                parts.append("".join(run))
+                run = []
+            parts.append(m)
+        else:
+            run.append(html)
+    if run:
+        parts.append("".join(run))
+    return parts
+
+def _emit(target, parts) -> None:
+    """Write transcript parts: one st.html per HTML run, a chat bubble per markdown body."""
+    for part in parts:
+        if isinstance(part, str):
+            target.html(part)
+        else:
+            target.chat_message(part["role"]).markdown(part["content"])
+
+def _history_parts(msgs: deque) -> list:
+    """
+    Transcript parts (see _transcript_parts). Per-message bubbles are kept in
+    session state keyed by message id, so a rerun only converts messages newer
+    than the last one rendered and drops bubbles the history deque has
+    evicted; unchanged history returns the previous parts as is. A change
+    still re-joins the (at most _HISTORY_CAP) bubbles.
+    """
+    if not msgs:
+        return []
+    first_id, last_id = msgs[0]["id"], msgs[-1]["id"]
+    # (first_id, last_id, parts, bubbles: deque of _bubble() tuples)
+    cached = st.session_state.get("_history_parts")
+    if cached and cached[:2] == (first_id, last_id):
+        return cached[2]
+    bubbles = cached[3] if cached and cached[1] <= last_id else deque()
+    while bubbles and bubbles[0][0] < first_id:
+        bubbles.popleft()  # evicted from the front of the history deque
+    if bubbles:
+        done = bubbles[-1][0]
+        new = reversed(list(takewhile(lambda m: m["id"] > done, reversed(msgs))))
+    else:
+        new = msgs  # first render, or everything rendered was evicted
+    bubbles.extend(map(_bubble, new))
+    parts = _transcript_parts(bubbles)
+    st.session_state["_history_parts"] = (first_id, last_id, parts, bubbles)
+    return parts
+
+# Shared role strings: every message dict points at the same two objects
+_USER = sys.intern("user")
+_ASSISTANT = sys.intern("assistant")
+
+# Message entries kept per session; the deque drops the oldest on append.
+# Bodies are kept whole: the model's history is cut by its token budget
+# (lumii_core_logic_v2._recent_history), not here.
+_HISTORY_CAP = 60
+
+def _append_message(msgs: deque, role: str, content: str) -> None:
+    msgs.append({"id": msgs[-1]["id"] + 1 if msgs else 0, "role": role, "content": content})
 
 # ───────────────────────── Light styles ───────────────────────
-st.markdown("""
-<style>
-:root { --maxw: 1000px; --muted:#5b6270; --radius:18px; }
-.main > div { max-width: var(--maxw); margin: 0 auto; }
-h1,h2,h3 { margin: .25rem 0 .75rem; }
-.center { text-align:center; }
-.subtitle { color: var(--muted); margin-top:.25rem; }
-
-/* Page tone + cards */
-body { background:#fbfcfe; }
-.card { background:#fff; border:1px solid rgba(0,0,0,.05); border-radius:14px; padding:16px;
-        box-shadow:0 2px 8px rgba(0,0,0,.05); }
-
-/* Chat input */
-.stChatInput textarea { border-radius:14px!important; border:1px solid rgba(0,0,0,.12)!important; }
-</style>
-""", unsafe_allow_html=True)
-
-# ───────────────────────── Session ────────────────────────────
-if "messages" not in st.session_state:
-    st.session_state["messages"] = []
-if "chat_input" not in st.session_state:
-    st.session_state["chat_input"] = ""
-
-# --- Core logic state (for Lumii) ---
-if "lumii_state" not in st.session_state:
-    st.session_state["lumii_state"] = LumiiState()
-
-# local handle
-state = st.session_state["lumii_state"]
-
-# make sure messages list is synced between UI and logic
-state.setdefault("messages", st.session_state["messages"])
-state["messages"] = st.session_state["messages"]
-
-# ── Daily quota init/rollover ────────────────────────────────────────────────
-today = datetime.now(TZ).date().isoformat()
-dq = st.session_state.get("daily_quota") or {"date": today, "used": 0}
-if dq.get("date") != today:
-    dq = {"date": today, "used": 0}
-st.session_state["daily_quota"] = dq
-remaining = max(0, DAILY_LIMIT - dq["used"])
+# The single stylesheet element of the page. Kept on st.markdown: a style-only
+# st.html still takes a row of layout gap on the 1.3x releases we support.
+st.markdown(CSS, unsafe_allow_html=True)
 
 # ───────────────────────── Full Disclaimer (pre-chat) ─────────
-def show_disclaimer():
-    # Hero (logo + text inside the same gradient box)
-    _b64 = _logo_b64("logo.png")
-    st.markdown(f"""
-    <style>
-      /* stack on small screens */
-      @media (max-width: 700px) {{
-        .lumii-hero-flex {{ flex-direction: column; text-align: center; }}
-        .lumii-hero-flex img {{ width: 120px !important; margin-bottom: .5rem; }}
-      }}
-    </style>
-    <div style="
-         background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
-         border-radius: 18px; margin-bottom: 2rem; color: white;
-         padding: 1.75rem 1.5rem;">
-      <div class="lumii-hero-flex" style="
-           display: flex; align-items: center; gap: 18px;">
-        {"<img src='data:image/png;base64," + _b64 + "' alt='Lumii Logo' style='width:160px; border-radius:16px; filter:drop-shadow(0 4px 10px rgba(0,0,0,.15));'>" if _b64 else ""}
-        <div>
-          <h1 style="font-size: 2.4rem; margin:.25rem 0 .4rem;">Welcome to My Friend Lumii</h1>
-          <p style="font-size:1.15rem; margin:0; opacity:.95;">An intelligent and safe AI learning & wellbeing companion for K–12 students</p>
-        </div>
-      </div>
-    </div>
-    """, unsafe_allow_html=True
-)
-
-    st.markdown("</div>", unsafe_allow_html=True)
-
-    # --- Beta + Safety + Feel-good (boxed, theme-safe) ---
-    with st.container(border=True):
-        st.subheader("🚀 Beta club")
-        st.write("You’re one of our first 100 beta testing families — thank you! Your feedback will directly shape the way Lumii works.")
-
-    with st.container(border=True):
-        st.subheader("🛡️ Safety First")
-        st.write("""Lumii is safe & private with strict data privacy. 
-Lumii has built-in age-appropriate responses & is trained to filter out potentially inappropriate content* 
-*beta testing terms apply.""")
-
-    with st.container(border=True):
-        st.subheader("💚 Feel-good learning (wellbeing built in)")
-        st.write("Short mood check-ins, mini breaks, and cheering messages to keep stress low and confidence high.")
-
-    # --- Subjects (boxed section with a simple grid) ---
-    with st.container(border=True):
-        st.markdown("## 📚 Subjects I can help with")
-
-        row1 = st.columns(3)
-        with row1[0]:
-            st.markdown("**🧮 Mathematics**  \nAlgebra, Geometry, Calculus")
-        with row1[1]:
-            st.markdown("**⚡ Physics**  \nMotion, Energy, Electricity")
-        with row1[2]:
-            st.markdown("**🧪 Chemistry**  \nReactions, Periodic Table")
-
-        row2 = st.columns(3)
-        with row2[0]:
-            st.markdown("**🌍 Geography**  \nMaps, Countries")
-        with row2[1]:
-            st.markdown("**🏛️ History**  \nEvents, Timelines")
-        with row2[2]:
-            st.markdown("**📖 Study Skills**  \nOrganization, Test Prep")
+# Static strings are built once per process: cache_resource hands back the
+# same object, where cache_data would unpickle a fresh copy on every hit.
+@st.cache_resource
+def _disclaimer_html() -> str:
+    """Hero + highlight cards + subjects grid as one static HTML blob."""
+    hero = HERO_PREFIX + _logo_img(160, "0 4px 10px rgba(0,0,0,.15)") + HERO_SUFFIX
+    parts = (hero, HIGHLIGHTS_HTML, SUBJECTS_HTML)
+    return "\n".join(p.strip() for p in parts)
+
+@st.cache_resource
+def _disclaimer_text() -> str:
+    """Expander heading + legal text as one markdown element."""
+    # strip first: the leading indented line would otherwise become a code block
+    return "## 📜 Disclaimer\n\n" + textwrap.dedent(DISCLAIMER_MD).strip()
+
+def _accept_disclaimer() -> None:
+    st.session_state["agreed_version"] = DISCLAIMER_VERSION
 
+def show_disclaimer():
+    # Hero, Beta/Safety/Feel-good cards and subjects grid in a single element
+    st.html(_disclaimer_html())
 
     # --- Disclaimer (dark-mode safe) ---
     with st.expander("📜 Disclaimer — click to read and agree", expanded=False):
-        st.markdown("## 📜 Disclaimer")
-        st.markdown("""
-        Beta Testing Disclaimer
-Important Notice: Beta Software
-
-This is beta software under active development. By using MyFriendLumii K-12 Learning Companion, you acknowledge and agree to the following terms:
-
-Educational Use Limitations
-
-This tool is designed to supplement, not replace traditional teaching methods and human instruction
-All educational content should be verified by qualified educators before relying on it for learning outcomes
-The AI may provide incomplete, inaccurate, or inappropriate responses - always use with adult supervision for K-12 students
-Not suitable for high-stakes educational decisions such as grading, placement, or assessment
-
-Beta Software Risks
-- Service interruptions and unexpected downtime may occur
-- Data loss is possible - do not rely on the service to store critical information
-- Features may change or be removed without notice as we improve the platform
-- Response quality and accuracy will vary as we refine our algorithms
-
-Privacy and Data Protection
-- Student interactions may be logged and analyzed to improve our service
-- We follow applicable  privacy laws 
-- No personal identifying information should be shared in conversations
-- Parents and educators should review all interactions involving minors
-
-No Warranties
-- MyFriendLumii provides this beta service "AS IS" without any warranties, express or implied
-- We make no guarantees about educational outcomes, content accuracy, or service availability
-- Use at your own risk and discretion
-
-Your Participation
-By participating in our beta program, you agree to:
-- Provide constructive feedback about bugs, issues, and improvements
-- Use the service responsibly and in accordance with educational best practices
-- Supervise student interactions and ensure age-appropriate usage
-- Report any concerning behavior or inappropriate content immediately after using the app via dedicated form.
-
-Contact
-For questions, concerns, or to report issues: 
-Last Updated: 
-This disclaimer may be updated as our beta program evolves. Continued use constitutes acceptance of any changes.
-
-THE BETA SOFTWARE PROGRAM PRODUCT LICENSED HERE UNDER IS STILL IN ITS TESTING PHASE AND IS PROVIDED ON AN “AS IS” AND “AS AVAILABLE” BASIS AND IS BELIEVED TO CONTAIN DEFECTS.
-A PRIMARY PURPOSE OF THIS BETA TESTING LICENCE IS TO OBTAIN FEEDBACK ON SOFTWARE PERFORMANCE AND THE IDENTIFICATION OF DEFECTS.
-LICENSEE IS ADVISED TO SAFEGUARD IMPORTANT DATA, TO USE CAUTION AND NOT TO RELY IN ANY WAY ON THE CORRECT FUNCTIONING OR PERFORMANCE OF THE BETA SOFTWARE PROGRAM PRODUCT AND/OR ACCOMPANYING MATERIALS OR DOCUMENTATION.
-        """)
+        st.markdown(_disclaimer_text())
 
         agree_check = st.checkbox("I have read and understood the disclaimer", key="agree_ck")
 
         col_l, col_c, col_r = st.columns([1, 2, 1])
         with col_c:
-            st.markdown("<div style='margin-top:.5rem'></div>", unsafe_allow_html=True)
-            if st.button("✅ I Agree & Start Learning", use_container_width=True, disabled=not agree_check, key="agree_btn"):
-                st.session_state["agreed_version"] = DISCLAIMER_VERSION
-                st.rerun()
+            st.html("<div style='margin-top:.5rem'></div>")
+            # callback runs before the click's rerun, so that run already passes the gate
+            st.button("✅ I Agree & Start Learning", use_container_width=True, disabled=not agree_check,
+                      key="agree_btn", on_click=_accept_disclaimer)
 
     # IMPORTANT: stop the rest of the app from rendering until agreed
     st.stop()
 
 
-if st.session_state.get("agreed_version") != DISCLAIMER_VERSION:
-    show_disclaimer()
-    st.stop()
+# Gate before any chat/session setup so gated reruns skip that work entirely.
+# The version check runs until it first passes; after that one bool decides.
+if not st.session_state.get("_agreed_ok"):
+    if st.session_state.get("agreed_version") != DISCLAIMER_VERSION:
+        show_disclaimer()
+        st.stop()
+    st.session_state["_agreed_ok"] = True
+
+# ───────────────────────── Session ────────────────────────────
+# --- Core logic state (for Lumii) ---
+# LumiiState owns the one and only message list; the UI reads it directly.
+# It is a TypedDict, i.e. a plain dict at runtime, so no core import is needed.
+if "lumii_state" not in st.session_state:
+    st.session_state["lumii_state"] = {}
+state = st.session_state["lumii_state"]
+if "messages" not in state:
+    state["messages"] = deque(maxlen=_HISTORY_CAP)
+messages = state["messages"]
+
+@st.cache_resource
+def _api_key() -> str:
+    """Secrets are per-deploy: read once for the whole process, not per session."""
+    return st.secrets.get("GROQ_API_KEY", "")
+
+API_KEY = _api_key()
 
 # ───────────────────────── Clean Chat UI ──────────────────────
 
-# Title (logo + title using same base64/flex approach as disclaimer)
-_b64 = _logo_b64("logo.png")
-st.markdown(f"""
-<style>
-  /* Stack on small screens */
-  @media (max-width: 700px) {{
-    .lumii-chat-header {{ flex-direction: column; text-align: center; gap: 10px; }}
-    .lumii-chat-header img {{ width: 90px !important; }}
-  }}
-</style>
-<div style="display:flex; align-items:center; justify-content:center; margin:.25rem 0 .35rem;">
-  <div class="lumii-chat-header" style="display:flex; align-items:center; justify-content:center; gap:14px;">
-    {("<img src='data:image/png;base64," + _b64 + "' alt='Lumii Logo' "
-      "style='width:110px; border-radius:16px; filter:drop-shadow(0 3px 8px rgba(0,0,0,.12));'>") if _b64 else ""}
-    <h1 style="margin:.1rem 0 .2rem; line-height:1.1;">My Friend Lumii</h1>
-  </div>
-</div>
-""", unsafe_allow_html=True)
-
-# Status banner (own box, Option A)
-api_key = st.secrets.get("GROQ_API_KEY", "")
-if not api_key:
-    st.error("AI Offline — no API key configured", icon="⛔")
-elif st.session_state.get("memory_safe_mode"):
-    st.warning("Memory Safe Mode Active", icon="⚠️")
-else:
-    st.success("Smart AI with Safety Active", icon="✅")
-
-
-# History + greeting + disclaimer box (when empty)
-if st.session_state["messages"]:
-    for m in st.session_state["messages"]:
-        with st.chat_message(m["role"]):
-            st.markdown(m["content"])
-else:
-    # Greeting banner
-    st.info("👋 Hi! Ask me a question to get started.")
-
-    # Disclaimer box under the banner
-    st.markdown(
-        """
-        <style>
-        .beta-box{
-            margin: 10px 0 18px;
-            padding: .75rem 1rem;
-            background:#fff;
-            border:1px solid rgba(0,0,0,.08);
-            border-left: 4px solid #f7b500; /* subtle amber accent */
-            border-radius: 10px;
-            color:#222;
-            font-size:.95rem;
-        }
-        </style>
-        <div class="beta-box">
-            ⚠️ Beta version — may make mistakes. Please double-check important answers with a teacher or parent.
-        </div>
-        """,
-        unsafe_allow_html=True,
+@st.cache_resource
+def _chat_chrome_html(status: str) -> str:
+    """Header (logo + title) and status banner as one block."""
+    return (
+        HEADER_PREFIX + _logo_img(110, "0 3px 8px rgba(0,0,0,.12)") + HEADER_SUFFIX
+        + STATUS_BANNERS[status]
     )
 
-# --- Daily quota status (chat page only): show just above the input ---
-dq = st.session_state.get("daily_quota") or {
-    "date": datetime.now(TZ).date().isoformat(),
-    "used": 0
-}
-remaining = max(0, DAILY_LIMIT - dq.get("used", 0))
-st.caption(f"🔢 Daily messages left: {remaining}/{DAILY_LIMIT} (Europe/Ljubljana)")
-
-# --- Chat input (ALWAYS render this at top level, near the end) ---
-user_msg = st.chat_input("Type your question here…")
+# Title + status banner: one element instead of two
+st.html(_chat_chrome_html(render_status_badge(bool(API_KEY), bool(st.session_state.get("memory_safe_mode")))))
+
+
+def _stream_reply(slot, chunks, interval: float = 0.1) -> str:
+    """Write chunks into `slot` as an assistant bubble, at most every `interval`s."""
+    buf = []
+    last_flush = time.monotonic()
+    for tok in chunks:
+        buf.append(tok)
+        now = time.monotonic()
+        if now - last_flush > interval:
+            text = "".join(buf)
+            if needs_st_markdown(text):
+                slot.container().chat_message("assistant").markdown(text)
+            else:
+                # partial text: bypass the segment cache
+                slot.html(f'<div class="msg assistant">{markdown_to_html(text)}</div>')
+            last_flush = now
+    return "".join(buf)
+
+@st.fragment
+def chat_pane(state: dict, api_key: str) -> None:
+    """History, quota, input and the send handler. A send reruns only this pane."""
+    messages = state["messages"]
+
+    # ── Daily quota init/rollover (here so fragment-only reruns roll over too) ──
+    today = _today()
+    dq = st.session_state.get("daily_quota") or {"date": today, "used": 0}
+    if dq.get("date") != today:
+        dq = {"date": today, "used": 0}
+    st.session_state["daily_quota"] = dq
+    remaining = max(0, DAILY_LIMIT - dq.get("used", 0))
+
+    # History + greeting + disclaimer box (when empty)
+    # The transcript lives in its own container so a finished turn can be appended
+    # to it in the same run, without a full st.rerun().
+    chat_area = st.container()
+    intro = st.empty()
+    if messages:
+        # Cached per-message HTML bubbles, one element per run (the whole
+        # transcript unless a body needs st.markdown for math or emoji)
+        _emit(chat_area, _history_parts(messages))
+    else:
+        # Greeting banner + disclaimer box under it, as one element
+        intro.html(WELCOME_HTML)
+
+    def _show_new_turn(count: int = 2) -> None:
+        """Append the last `count` messages to the transcript in place of a rerun."""
+        intro.empty()
+        new = islice(messages, max(0, len(messages) - count), None)
+        _emit(chat_area, _transcript_parts(map(_bubble, new)))
+
+    # --- Daily quota status (chat page only): show just above the input ---
+    quota_caption = st.empty()
+    quota_caption.caption(f"🔢 Daily messages left: {remaining}/{DAILY_LIMIT} (Europe/Ljubljana)")
+
+    # --- Chat input ---
+    user_msg = st.chat_input("Type your question here…")
+    if not user_msg:
+        return
 
-if user_msg:
     # ── 0) Hard cap: block before we add to history or call the model ─────────
     if st.session_state["daily_quota"]["used"] >= DAILY_LIMIT:
         st.info(
@@ -284,14 +275,13 @@ if user_msg:
         )
         # Friendly button to your Google Form (configure FEEDBACK_FORM_URL at top)
         st.link_button("Share feedback", FEEDBACK_FORM_URL)
-        st.stop()
+        return
 
-    # ── 1) Append user message (for UI continuity) ────────────────────────────
-    st.session_state["messages"].append({"role": "user", "content": user_msg})
-    state["messages"] = st.session_state["messages"]
+    # ── 1) Append user message and show it right away ─────────────────────────
+    _append_message(messages, _USER, user_msg)
+    _show_new_turn(1)
 
     # ── 2) Check API key; offline helper DOES NOT consume quota ───────────────
-    api_key = st.secrets.get("GROQ_API_KEY", "")
     if not api_key:
         st.info("AI is offline (no API key found). Using helper mode for now.")
         helper = (
@@ -300,32 +290,43 @@ if user_msg:
             "2) Share what you’ve tried.\n"
             "3) I’ll guide you step-by-step."
         )
-        st.session_state["messages"].append({"role": "assistant", "content": helper})
-        state["messages"] = st.session_state["messages"]
-        st.rerun()
+        _append_message(messages, _ASSISTANT, helper)
+        _show_new_turn(1)
+        return
 
     # ── 3) We will call the model → consume 1 unit from today's quota ─────────
     st.session_state["daily_quota"]["used"] += 1
-
-    # ── 4) Normal LLM path (guards, retries, trimming inside) ─────────────────
-    result = generate_response_with_memory_safety(
+    remaining = max(0, DAILY_LIMIT - st.session_state["daily_quota"]["used"])
+    quota_caption.caption(f"🔢 Daily messages left: {remaining}/{DAILY_LIMIT} (Europe/Ljubljana)")
+
+    # ── 4) Normal LLM path (guards, retries, trimming inside), streamed ───────
+    # Core logic (requests, regex tables, tokenizer) loads on the first send,
+    # not before first paint; later imports hit sys.modules.
+    from lumii_core_logic_v2 import generate_response_with_memory_safety_stream
+    # Reserve the reply bubble so updates only ever touch this one element
+    reply_slot = chat_area.empty()
+    reply_slot.html('<div class="msg assistant">…</div>')
+    result: dict = {}
+    _stream_reply(reply_slot, generate_response_with_memory_safety_stream(
         state=state,
         message=user_msg,
         tool_name="lumii_main",
         api_key=api_key,
-    )
+        result=result,
+    ))
 
     # ── 5) Extract text + optional safety flag ────────────────────────────────
+    # result["content"] is authoritative: it may replace what was streamed
     ai_text = result.get("content") or "I ran into a temporary issue. Let’s try again."
     flag = result.get("priority")  # 'crisis' | 'manipulation' | 'subject_restricted' | None
 
-    # ── 6) Append assistant reply and keep states in sync ─────────────────────
-    st.session_state["messages"].append({"role": "assistant", "content": ai_text})
-    state["messages"] = st.session_state["messages"]
+    # ── 6) Append assistant reply, keep states in sync, and finalize the bubble ─
+    _append_message(messages, _ASSISTANT, ai_text)
+    _emit(reply_slot.container(), _transcript_parts([_bubble(messages[-1])]))
 
     # ── 7) Optional: surface a small banner if a safety path triggered ────────
     if flag in {"crisis", "manipulation", "subject_restricted"}:
         st.warning(f"Safety filter active: {flag.replace('_',' ')}")
 
-    st.rerun()
 
+chat_pane(state, API_KEY)
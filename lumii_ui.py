@@ -0,0 +1,232 @@
+"""
+Static markup and message rendering for the Lumii Streamlit app.
+
+Kept out of app.py because Streamlit re-executes the main script on every
+rerun; everything here is built once per process, on first import.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+
+from markdown_it import MarkdownIt
+
+# ───────────────────────── Message rendering ──────────────────
+# One parser for the whole process. Raw HTML in message bodies is escaped,
+# never passed through, so no separate sanitizer is needed.
+_MD = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+
+def markdown_to_html(text: str) -> str:
+    return _MD.render(text)
+
+# st.markdown renders $…$ math (KaTeX) and :name: emoji shortcodes; commonmark
+# would leave both as raw text, so such bodies take the st.markdown path.
+_ST_MARKDOWN_ONLY_RX = re.compile(r"\$|:[a-z0-9_+-]+:")
+
+def needs_st_markdown(text: str) -> bool:
+    return _ST_MARKDOWN_ONLY_RX.search(text) is not None
+
+_SEG_CACHE_MAX = 2048
+
+# Process-wide body-hash → HTML cache, shared by all sessions (FIFO-bounded)
+_SEG_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+def render_segment(text: str) -> str:
+    """Markdown → HTML for one message body, cached by content hash."""
+    k = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    html = _SEG_CACHE.get(k)
+    if html is None:
+        html = _SEG_CACHE[k] = markdown_to_html(text)
+        if len(_SEG_CACHE) > _SEG_CACHE_MAX:
+            _SEG_CACHE.popitem(last=False)
+    return html
+
+def message_html(m: dict) -> str:
+    return f'<div class="msg {m["role"]}">{render_segment(m["content"])}</div>'
+
+# ───────────────────────── Static markup ──────────────────────
+# Only the logo <img> tag (a static URL) is spliced in by the app.
+# Every rule the app uses, in one stylesheet (disclaimer + chat pages)
+CSS = """
+<style>
+:root { --maxw: 1000px; }
+.main > div { max-width: var(--maxw); margin: 0 auto; }
+h1,h2,h3 { margin: .25rem 0 .75rem; }
+
+/* Page tone */
+body { background:#fbfcfe; }
+
+/* Disclaimer hero: stack on small screens */
+@media (max-width: 700px) {
+  .lumii-hero-flex { flex-direction: column; text-align: center; }
+  .lumii-hero-flex img { width: 120px !important; margin-bottom: .5rem; }
+}
+
+/* Disclaimer cards: theme-safe, no fixed background so dark mode keeps working */
+.lumii-card { border:1px solid rgba(128,128,128,.3); border-radius:.5rem; padding:1rem 1.25rem; margin-bottom:1rem; }
+.lumii-card h2, .lumii-card h3 { margin:.1rem 0 .6rem; }
+.lumii-card p { margin:0; }
+.lumii-subjects { display:grid; grid-template-columns:repeat(3, 1fr); gap:1rem; }
+@media (max-width: 700px) { .lumii-subjects { grid-template-columns:1fr; } }
+
+/* Chat header: stack on small screens */
+@media (max-width: 700px) {
+  .lumii-chat-header { flex-direction: column; text-align: center; gap: 10px; }
+  .lumii-chat-header img { width: 90px !important; }
+}
+
+/* Status banner under the chat header (colours follow st.error/warning/success) */
+.lumii-status { padding:.75rem 1rem; margin:.25rem 0 1rem; border-radius:.5rem; }
+.lumii-status.critical { background:rgba(255,43,43,.09); color:#7d353b; }
+.lumii-status.warning { background:rgba(255,227,18,.1); color:#926c05; }
+.lumii-status.normal { background:rgba(33,195,84,.1); color:#177233; }
+
+/* Chat input */
+.stChatInput textarea { border-radius:14px!important; border:1px solid rgba(0,0,0,.12)!important; }
+
+/* Pre-rendered history bubbles */
+.msg { padding:.6rem .9rem; margin:.4rem 0; border-radius:14px; max-width:85%; }
+.msg p:last-child { margin-bottom:0; }
+.msg.user { margin-left:auto; background:rgba(79,172,254,.12); }
+.msg.assistant { margin-right:auto; background:rgba(128,128,128,.08); }
+
+/* Empty-chat greeting + beta box */
+.lumii-greeting { margin: 0 0 10px; padding: .75rem 1rem; background: rgba(28,131,225,.1); border-radius: 10px; }
+.beta-box {
+  margin: 10px 0 18px;
+  padding: .75rem 1rem;
+  background:#fff;
+  border:1px solid rgba(0,0,0,.08);
+  border-left: 4px solid #f7b500; /* subtle amber accent */
+  border-radius: 10px;
+  color:#222;
+  font-size:.95rem;
+}
+</style>
+"""
+
+HERO_PREFIX = """
+    <div style="
+         background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
+         border-radius: 18px; margin-bottom: 2rem; color: white;
+         padding: 1.75rem 1.5rem;">
+      <div class="lumii-hero-flex" style="
+           display: flex; align-items: center; gap: 18px;">
+        """
+HERO_SUFFIX = """
+        <div>
+          <h1 style="font-size: 2.4rem; margin:.25rem 0 .4rem;">Welcome to My Friend Lumii</h1>
+          <p style="font-size:1.15rem; margin:0; opacity:.95;">An intelligent and safe AI learning & wellbeing companion for K–12 students</p>
+        </div>
+      </div>
+    </div>
+    """
+
+HIGHLIGHTS_HTML = """
+<div class="lumii-card">
+  <h3>🚀 Beta club</h3>
+  <p>You’re one of our first 100 beta testing families — thank you! Your feedback will directly shape the way Lumii works.</p>
+</div>
+<div class="lumii-card">
+  <h3>🛡️ Safety First</h3>
+  <p>Lumii is safe &amp; private with strict data privacy.<br>
+  Lumii has built-in age-appropriate responses &amp; is trained to filter out potentially inappropriate content*<br>
+  *beta testing terms apply.</p>
+</div>
+<div class="lumii-card">
+  <h3>💚 Feel-good learning (wellbeing built in)</h3>
+  <p>Short mood check-ins, mini breaks, and cheering messages to keep stress low and confidence high.</p>
+</div>
+"""
+
+_SUBJECTS = (
+    ("🧮 Mathematics", "Algebra, Geometry, Calculus"),
+    ("⚡ Physics", "Motion, Energy, Electricity"),
+    ("🧪 Chemistry", "Reactions, Periodic Table"),
+    ("🌍 Geography", "Maps, Countries"),
+    ("🏛️ History", "Events, Timelines"),
+    ("📖 Study Skills", "Organization, Test Prep"),
+)
+_SUBJECT_CARDS_HTML = "\n".join(
+    f"    <div><strong>{title}</strong><br>{topics}</div>" for title, topics in _SUBJECTS
+)
+
+SUBJECTS_HTML = f"""
+<div class="lumii-card">
+  <h2>📚 Subjects I can help with</h2>
+  <div class="lumii-subjects">
+{_SUBJECT_CARDS_HTML}
+  </div>
+</div>
+"""
+
+HEADER_PREFIX = """
+<div style="display:flex; align-items:center; justify-content:center; margin:.25rem 0 .35rem;">
+  <div class="lumii-chat-header" style="display:flex; align-items:center; justify-content:center; gap:14px;">
+    """
+HEADER_SUFFIX = """
+    <h1 style="margin:.1rem 0 .2rem; line-height:1.1;">My Friend Lumii</h1>
+  </div>
+</div>
+"""
+
+WELCOME_HTML = """
+        <div class="lumii-greeting">👋 Hi! Ask me a question to get started.</div>
+        <div class="beta-box">
+            ⚠️ Beta version — may make mistakes. Please double-check important answers with a teacher or parent.
+        </div>
+        """
+
+DISCLAIMER_MD = """
+        Beta Testing Disclaimer
+Important Notice: Beta Software
+
+This is beta software under active development. By using MyFriendLumii K-12 Learning Companion, you acknowledge and agree to the following terms:
+
+Educational Use Limitations
+
+This tool is designed to supplement, not replace traditional teaching methods and human instruction
+All educational content should be verified by qualified educators before relying on it for learning outcomes
+The AI may provide incomplete, inaccurate, or inappropriate responses - always use with adult supervision for K-12 students
+Not suitable for high-stakes educational decisions such as grading, placement, or assessment
+
+Beta Software Risks
+- Service interruptions and unexpected downtime may occur
+- Data loss is possible - do not rely on the service to store critical information
+- Features may change or be removed without notice as we improve the platform
+- Response quality and accuracy will vary as we refine our algorithms
+
+Privacy and Data Protection
+- Student interactions may be logged and analyzed to improve our service
+- We follow applicable  privacy laws 
+- No personal identifying information should be shared in conversations
+- Parents and educators should review all interactions involving minors
+
+No Warranties
+- MyFriendLumii provides this beta service "AS IS" without any warranties, express or implied
+- We make no guarantees about educational outcomes, content accuracy, or service availability
+- Use at your own risk and discretion
+
+Your Participation
+By participating in our beta program, you agree to:
+- Provide constructive feedback about bugs, issues, and improvements
+- Use the service responsibly and in accordance with educational best practices
+- Supervise student interactions and ensure age-appropriate usage
+- Report any concerning behavior or inappropriate content immediately after using the app via dedicated form.
+
+Contact
+For questions, concerns, or to report issues: 
+Last Updated: 
+This disclaimer may be updated as our beta program evolves. Continued use constitutes acceptance of any changes.
+
+THE BETA SOFTWARE PROGRAM PRODUCT LICENSED HERE UNDER IS STILL IN ITS TESTING PHASE AND IS PROVIDED ON AN “AS IS” AND “AS AVAILABLE” BASIS AND IS BELIEVED TO CONTAIN DEFECTS.
+A PRIMARY PURPOSE OF THIS BETA TESTING LICENCE IS TO OBTAIN FEEDBACK ON SOFTWARE PERFORMANCE AND THE IDENTIFICATION OF DEFECTS.
+LICENSEE IS ADVISED TO SAFEGUARD IMPORTANT DATA, TO USE CAUTION AND NOT TO RELY IN ANY WAY ON THE CORRECT FUNCTIONING OR PERFORMANCE OF THE BETA SOFTWARE PROGRAM PRODUCT AND/OR ACCOMPANYING MATERIALS OR DOCUMENTATION.
+        """
+
+# Status banner markup per level; rendered inside the header block
+STATUS_BANNERS = {
+    "critical": '<div class="lumii-status critical">⛔ AI Offline — no API key configured</div>',
+    "warning": '<div class="lumii-status warning">⚠️ Memory Safe Mode Active</div>',
+    "normal": '<div class="lumii-status normal">✅ Smart AI with Safety Active</div>',
+}
@@ -0,0 +1,44 @@
+import random
+import unittest
+from collections import deque
+
+import lumii_core_logic_v2 as core
+
+
+def _reference_history(state, budget):
+    """The original path: build the whole history, keep the longest suffix that fits."""
+    total, kept = 0, []
+    for msg in reversed(core.build_conversation_history(state)):
+        cost = core._estimate_tokens(msg.get("content", ""))
+        if total + cost > budget:
+            break
+        kept.append(msg)
+        total += cost
+    return list(reversed(kept))
+
+
+class RecentHistoryTest(unittest.TestCase):
+    def test_long_mixed_history_matches_build_then_trim(self):
+        rnd = random.Random(0)
+        for _ in range(500):
+            msgs = deque(maxlen=60)
+            for i in range(rnd.randint(0, 80)):
+                role = rnd.choice(("user", "assistant", "assistant", "system"))
+                msgs.append({"id": i, "role": role, "content": "w" * rnd.randint(0, 400)})
+            state = {"messages": msgs}
+            if rnd.random() < 0.5:
+                state["conversation_summary"] = "s" * rnd.randint(1, 600)
+            budget = rnd.choice((0, 50, 600, 2400))
+            self.assertEqual(core._recent_history(state, budget), _reference_history(state, budget))
+
+    def test_short_turns_all_reach_the_model(self):
+        msgs = deque(({"id": i, "role": "user" if i % 2 == 0 else "assistant", "content": f"msg {i}"}
+                      for i in range(24)), maxlen=60)
+        state = {"messages": msgs, "conversation_summary": "earlier: fractions"}
+        history = core._recent_history(state, 2400)
+        self.assertEqual(len(history), 25)
+        self.assertEqual(history[0], {"role": "system", "content": "earlier: fractions"})
+
+
+if __name__ == "__main__":
+    unittest.main()